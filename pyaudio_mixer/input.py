@@ -1,5 +1,5 @@
 import threading
-import time
+import warnings
 from typing import Union
 
 import numpy as np
@@ -20,16 +20,18 @@ class InputTrack:
     `callback` : Callable
         A user supplied function that looks and functions like the one provided below. Defaults to None. This callback can be used to modify the data before being returned by the .read() method.
 
-        >>> def callback(track: InputTrack, data: np.ndarray, overflow: bool) -> np.ndarray:
-        >>>     # Modify `data` to your likings if needed. Then return it back either as a ndarray again or "None"
-        >>>     return data
+        >>> def callback(track: InputTrack, data: np.ndarray, overflow: bool) -> None:
+        >>>     # Modify `data` in place to your likings if needed (e.g., data *= 0.5). Nothing has to be returned.
+        >>>     data *= 0.5
+
+        `data` is the track's own capture buffer so it can be modified without copying it first. Returning `data` itself is fine as well, returning a different ndarray still works but is deprecated since it means allocating a new array for every block.
     `apply_basic_fx` : bool
         Whether to apply the basic effects such as the volume changer. Defaults to True. This uses the BasicFX class.
     `volume` : float
         The volume of this track (how loud the input is). Defaults to 1.0 (100%). Volume changing is controlled by the BasicFX class.
     `effect_parameters` :
         Dictionary that tells the BasicFX class what effects to use. Key being the function effect and the value (which is a another dictionary) being the parameters. Defaults to None. (Do not set a set_volume effect here. That is controlled by the `volume` parameter)
-    `chunk_size` : The size of each chunk returned from .read(). Defaults to 512.
+    `chunk_size` : The size of each chunk returned from .read(). Defaults to 512. This is also used as the blocksize of the sd.InputStream.
     """
 
     def __init__(self, name: str, **kwargs) -> None:
@@ -41,12 +43,19 @@ class InputTrack:
         self.__kwargs = kwargs
 
         # Signal Variables
-        self._stop_signal = False
-        self._stopped = True
+        self._stop_evt = threading.Event()
+        self._started_evt = threading.Event()
+        self._stopped_evt = threading.Event()
+        self._stopped_evt.set()
 
         # Data Variable
-        self.__data = None
-        self.__buffer = []
+        # Captured blocks go into two buffers in turns so the one read() returns is never the one being written to.
+        # Every captured block bumps the sequence number, read() uses it to tell if there is a new block.
+        self.__buffers = None
+        self.__idx = 0
+        self.__seq = 0
+        self.__read_seq = 0
+        self._data_evt = threading.Event()
         self.overflow = False
 
         # BasicFX
@@ -63,6 +72,10 @@ class InputTrack:
         self.stream = None
         self.start()
 
+    @property
+    def _stopped(self) -> bool:
+        return not self._started_evt.is_set()
+
     @property
     def volume(self) -> float:
         return self.effect_parameters["set_volume"]["factor"]
@@ -110,64 +123,93 @@ class InputTrack:
         Returns
         -------
         `np.ndarray` :
-            Audio data with shape of (frames (or size of chunks), channels).
+            Audio data with shape of (frames (or size of chunks), channels). This may be the track's own capture buffer (e.g., when no effects are applied) which gets reused for the block after next, so copy it if you need to keep it around for longer.
         `None` :
-            If the data that's supposed to be returned is the same as the last few returned data. When calling .read() constantly (which you most likely would), you should always check if the value is None.
+            If no new block has been captured since the last call (or the track is stopped). When calling .read() constantly (which you most likely would), you should always check if the value is None. Use wait() to block until there is a new block instead of spinning.
         """
 
-        data = self.__data
+        seq = self.__seq
+        if seq == self.__read_seq:
+            return
+        self.__read_seq = seq
+
+        buffers = self.__buffers
+        if buffers is None:
+            return
+        data = buffers[self.__idx]
+
         if self.callback:
-            data = self.callback(self, data, self.overflow)
+            returned = self.callback(self, data, self.overflow)
+            if returned is not None and returned is not data:
+                warnings.warn(
+                    "returning a new ndarray from an InputTrack callback is deprecated, modify `data` in place instead",
+                    DeprecationWarning,
+                    stacklevel=2,
+                )
+                data = returned
 
         if self.apply_basic_fx:
             data = self._apply_basic_fx(data)
 
-        data = np.resize(
-            data,
-            (
-                self.chunk_size,
-                self.sounddevice_parameters.get("channels", sd.default.channels[0]),
-            ),
+        shape = (
+            self.chunk_size,
+            self.sounddevice_parameters.get("channels", sd.default.channels[0]),
         )
+        if data.shape != shape:
+            data = np.resize(data, shape)
+        return data
 
-        if any((data == x).all() for x in self.__buffer):
-            return
-
-        self.__buffer.append(data)
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Block until there is a new block for read() to return or until `timeout` seconds have passed.
 
-        if len(self.__buffer) > 1024:
-            self.__buffer.pop(0)
+        Returns
+        -------
+        `bool` :
+            Whether there is a new block.
+        """
 
-        return data
+        self._data_evt.clear()
+        if self.__seq != self.__read_seq:
+            return True
+        return self._data_evt.wait(timeout)
 
     def start(self) -> None:
+        self._stopped_evt.clear()
         threading.Thread(target=self.__start__, daemon=True).start()
-
-        while self._stopped:
-            time.sleep(0.001)
+        self._started_evt.wait()
 
     def stop(self) -> None:
-        self._stop_signal = True
-        while not self._stopped:
-            time.sleep(0.001)
+        self._stop_evt.set()
+        self._stopped_evt.wait()
+
+    def __callback__(self, indata: np.ndarray, frames: int, time, status) -> None:
+        # Called by PortAudio every time a new block of `chunk_size` frames is captured.
+        idx = 1 - self.__idx
+        np.copyto(self.__buffers[idx], indata)
+        self.__idx = idx
+        self.overflow = status.input_overflow
+        self.__seq += 1
+        self._data_evt.set()
 
     def __start__(self) -> None:
-        with sd.InputStream(**self.sounddevice_parameters) as f:
-            self._stopped = False
+        params = {
+            **self.sounddevice_parameters,
+            "blocksize": self.chunk_size,
+            "callback": self.__callback__,
+        }
+        stream = sd.InputStream(**params)
+        self.__buffers = np.empty(
+            (2, stream.blocksize, stream.channels), dtype=stream.dtype
+        )
+        with stream as f:
             self.stream = f
-            while not self._stop_signal:
-                try:
-                    data, overflow = f.read(self.chunk_size)
-                except sd.PortAudioError:
-                    break
-
-                self.__data = data
-                self.overflow = overflow
-
-                time.sleep(0.001)
+            self._started_evt.set()
+            self._stop_evt.wait()
 
         """This code is only reached once the track has been stopped."""
-        self._stopped = True
+        self._started_evt.clear()
         self.stream = None
-        self.__data = None
-        self._stop_signal = False
+        self.__buffers = None
+        self._stop_evt.clear()
+        self._stopped_evt.set()
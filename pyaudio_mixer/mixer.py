@@ -110,8 +110,9 @@ class Mixer:
             await track.abort()
 
     async def stop_outputs(self) -> None:
+        # Closed rather than only stopped so their devices are released, start() opens them again.
         for track in self.output_tracks:
-            await track.stop()
+            await track.close()
 
     async def stop_inputs(self) -> None:
         for track in self.input_tracks:
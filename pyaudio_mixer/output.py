@@ -1,26 +1,55 @@
 import asyncio
+import concurrent.futures
+import functools
+import hashlib
+import itertools
+import math
 import os
 import queue
 import threading
-import time
+import traceback
+import weakref
 from pathlib import Path
-from typing import List, Union
+from typing import Iterator, List, NamedTuple, Union
 
 import ffmpy
 import librosa
 import numpy as np
 import sounddevice as sd
 import soundfile as sf
+import soxr
+
+try:
+    # Optional, decodes formats soundfile doesn't support in-process instead of through the FFmpeg executable.
+    import av
+except ImportError:
+    av = None
 
 from .exceptions import *
 from .input import InputTrack
-from .utils import BasicFX
+from .utils import (
+    BasicFX,
+    RingBuffer,
+    channel_matrix,
+    flush_denormals,
+    polyphase_resample,
+)
 
 sd.default.channels = 2
 sd.default.samplerate = 44100
 sd.default.dtype = "float32"
 
 
+class PlayingDetails(NamedTuple):
+    """Details about the file an OutputTrack is playing, set once when playback starts."""
+
+    file: str
+    duration: float
+    samplerate: int
+    channels: int
+    read: int = 0  # How many seconds were already read
+
+
 class OutputTrack:
 
     """
@@ -29,13 +58,13 @@ class OutputTrack:
     `name`: str
         The name of this track.
     `callback` : Callable
-        A user supplied function that looks and functions like this. Defaults to None. This callback can be used to modify the data before playing it back to the user.
+        A user supplied function that looks and functions like this. Defaults to None. This callback can be used to modify the data before playing it back to the user. It's called by write() (so from the thread writing, for play_file that's the feeder thread of this track) with every chunk before the effects are applied and it gets buffered, returning None drops the chunk. While there is nothing to play, it's called with `data` being None from a separate thread instead, audio returned from there (anything but None) gets played. Nothing of it runs on the stream's own thread.
 
         >>> def callback(track: OutputTrack, data: np.ndarray) -> np.ndarray:
         >>>     # Modify `data` to your likings if needed then you must return it back.
         >>>     return data
     `sounddevice_parameters` : dict
-        Key, Value pair that will be passed as parameter to sd.OutputStream. Defaults to None.
+        Key, Value pair that will be passed as parameter to sd.OutputStream. Defaults to None. The blocksize is always set (512 if not provided) since the buffers of this track are allocated for that exact size. The latency defaults to "low".
     `conversion_path` : str
         Directory to store ffmpeg conversions. FFMpeg conversions are done when the provided file format is not supported. Defaults to None. When this is None, a UnsupportedFormat is instead raised everytime PyAudioMixer encounters a unsupported audio format.
     `apply_basic_fx` : bool
@@ -45,7 +74,7 @@ class OutputTrack:
     `effect_parameters` :
         Dictionary that tells the BasicFX class what effects to use. Key being the function effect and the value (which is a another dictionary) being the parameters. Defaults to None. (Do not set a set_volume effect here. That is controlled by the `volume` parameter)
     `queue_maxsize` : int
-        The maxsize parameter passed onto the queue.Queue of this track. Defaults to 50. You usually don't need to touch this.
+        How many blocks (of the stream's blocksize, or 512 frames if the blocksize isn't set) the buffer of this track can hold. Defaults to 50. You usually don't need to touch this.
     """
 
     def __init__(self, name: str, **kwargs) -> None:
@@ -53,27 +82,55 @@ class OutputTrack:
         self.callback = kwargs.get("callback")
         self.sounddevice_parameters = kwargs.get("sounddevice_parameters", {})
         self.conversion_path = kwargs.get("conversion_path")
-        self.apply_basic_fx = kwargs.get("apply_basic_fx", True)
+        self._apply_basic_fx = kwargs.get("apply_basic_fx", True)
         self.__kwargs = kwargs
 
-        # Main queue, this is where all data that
+        # Main buffer, this is where all data that
         # then gets outputted to the user is stored.
         # Based on my testing, there is usually no reason to
         # change the max size, but it can be changed by passing
         # `queue_maxsize` as a parameter of this class.
-        self.q = queue.Queue(maxsize=kwargs.get("queue_maxsize", 50))
+        blocksize = self.sounddevice_parameters.get("blocksize") or 512
+        channels = self.sounddevice_parameters.get("channels", sd.default.channels[1])
+        dtype = self.sounddevice_parameters.get("dtype", sd.default.dtype[1])
+
+        # Audio is kept as float32 until the moment it gets written to the stream.
+        self._ring = RingBuffer(
+            kwargs.get("queue_maxsize", 50) * blocksize, channels, "float32"
+        )
+        # Preallocated blocks for the stream callback, so it never has to allocate anything.
+        self._block = np.empty((blocksize, channels), dtype=np.float32)
+        self._scratch = np.empty_like(self._block)
+        self._silence = np.zeros((blocksize, channels), dtype=dtype)
+        self._iinfo = np.iinfo(dtype) if np.dtype(dtype).kind in "iu" else None
+
+        # 10ms cosine squared fades, put on the start and end of every file played with play_file so it doesn't click.
+        samplerate = self.sounddevice_parameters.get(
+            "samplerate", sd.default.samplerate
+        )
+        t = np.arange(int(0.01 * samplerate), dtype=np.float32) / int(0.01 * samplerate)
+        self._fade_in = (np.sin(0.5 * np.pi * t) ** 2)[:, None]
+        self._fade_out = self._fade_in[::-1].copy()
 
         # Signal Variables
-        self._clear_signal = False
-        self._stop_signal = False
+        self._epoch = 0
+        self._stop_evt = threading.Event()
         self._stop_cast_signal = False
-        self._stopped = True
-        self._playing = False
-        self._playing_details = {}
+        self._cast_thread = None
+        self._started_evt = threading.Event()
+        self._playing_evt = threading.Event()
+        self._idle_evt = threading.Event()
+        self._idle_evt.set()
+        self._playing_details = None
+        # The public (dict) form of _playing_details, built once when playback starts so reading it doesn't allocate.
+        self._playing_details_dict = None
 
         # Effect variables
+        # The gain of the current volume, computed whenever the volume changes (see _update_gain) so the callback only has to
+        # load this single element instead of going through `effect_parameters`.
+        self._gain_arr = np.ones(1, dtype=np.float32)
         self.basicfx = BasicFX(
-            dtype=self.sounddevice_parameters.get("dtype", sd.default.dtype[1]),
+            dtype="float32",
             samplerate=self.sounddevice_parameters.get(
                 "samplerate", sd.default.samplerate
             ),
@@ -82,17 +139,59 @@ class OutputTrack:
         self.effect_parameters = {}
         self.update_effects(__effect_params)
 
+        # Feeder thread that runs the jobs of play_file (decoding, resampling and writing) one after the other so none of it
+        # happens on the event loop. It's started by start() and lives until close() is called.
+        self._jobs = None
+        self._decode_block = None
+
+        # The stream only drops a notification in here when the callback has to be called with None (i.e., nothing is playing),
+        # the callback itself is called from a separate thread so the stream's thread never runs any user code.
+        # Started by start() and lives until close() is called.
+        self._callback_queue = None
+
         # Start the track on initialization
         self.stream = None
         self.start()
 
+    @property
+    def _stopped(self) -> bool:
+        return not self._started_evt.is_set()
+
+    @property
+    def _stop_signal(self) -> bool:
+        # Whether stop() is in progress, nothing gets buffered meanwhile.
+        return self._stop_evt.is_set()
+
     @property
     def volume(self) -> float:
         return self.effect_parameters["set_volume"]["factor"]
 
     @volume.setter
     def volume(self, value: float) -> None:
+        # Raises before anything is changed if the volume is invalid
+        self.basicfx.gain(value)
         self.effect_parameters["set_volume"]["factor"] = value
+        self._update_gain()
+
+    @property
+    def apply_basic_fx(self) -> bool:
+        return self._apply_basic_fx
+
+    @apply_basic_fx.setter
+    def apply_basic_fx(self, value: bool) -> None:
+        self._apply_basic_fx = value
+        self._update_gain()
+
+    @property
+    def _playing(self) -> bool:
+        return self._playing_evt.is_set()
+
+    @property
+    def epoch(self) -> int:
+        """
+        Incremented every time abort() is called. Pass it to write() to have it raise a InterruptedError once the data you're writing has been aborted.
+        """
+        return self._epoch
 
     @property
     def playing_details(self) -> Union[None, dict]:
@@ -100,9 +199,7 @@ class OutputTrack:
         Get details about the currently playing file (played via play_file coroutine). Returns None if there is no playing file.
         """
 
-        if self._playing_details:
-            return self._playing_details
-        return None
+        return self._playing_details_dict
 
     def update_effects(self, effect_parameters: dict) -> dict:
         """
@@ -122,35 +219,99 @@ class OutputTrack:
             },
             **effect_parameters,
         }
+        self._update_gain()
         return self.effect_parameters
 
     def start(self) -> None:
-        threading.Thread(target=self.__start__, daemon=True).start()
+        if self._jobs is None:
+            # Only the queue is handed to the thread (not the track) so it doesn't keep the track alive.
+            self._jobs = queue.Queue()
+            threading.Thread(
+                target=self.__feed__, args=(self._jobs,), daemon=True
+            ).start()
+
+        if self._callback_queue is None:
+            self._callback_queue = queue.SimpleQueue()
+            threading.Thread(
+                target=self.__notify__,
+                args=(weakref.ref(self), self._callback_queue),
+                daemon=True,
+            ).start()
+
+        # The stream is only opened once, stopping and starting the track afterwards reuses it.
+        if self.stream is None:
+            self.stream = sd.OutputStream(
+                **{
+                    "latency": "low",
+                    **self.sounddevice_parameters,
+                    "blocksize": len(self._block),
+                    "callback": self.__callback__,
+                }
+            )
 
-        # Wait for it to start before returning
-        while self._stopped:
-            time.sleep(0.001)
+        if not self.stream.active:
+            self.stream.start()
+        self._started_evt.set()
 
     async def stop(self) -> None:
+        # Nothing new gets buffered while stopping (see _buffer), so there's nothing left to play once the stream is stopped.
+        self._stop_evt.set()
+
+        # The cast has to be gone before aborting, it would keep the buffer from ever running empty otherwise.
+        cast = self._cast_thread
+        if cast is not None and cast.is_alive():
+            self.stop_cast()
+            await asyncio.get_event_loop().run_in_executor(None, cast.join)
+
         await self.abort()
-        self.stop_cast()
-        self._stop_signal = True
 
-        # Wait for it to stop before returning
-        while not self._stopped:
-            await asyncio.sleep(0.001)
+        # Stopping waits for the last blocks to be played so do it outside of the event loop.
+        if self.stream is not None:
+            await asyncio.get_event_loop().run_in_executor(None, self.stream.stop)
+        # A write that was already waiting for space when stop() was called may still have gotten through
+        self._ring.clear()
+
+        self._playing_evt.clear()
+        self._idle_evt.set()
+        self._started_evt.clear()
+        self._stop_evt.clear()
+
+    async def close(self) -> None:
+        """Stop this track, close its stream and let its threads exit. Calling start() afterwards opens a new stream."""
+        await self.stop()
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+        # None tells the feeder and the notifier to exit after whatever they have left
+        if self._jobs is not None:
+            self._jobs.put(None)
+            self._jobs = None
+        if self._callback_queue is not None:
+            self._callback_queue.put(None)
+            self._callback_queue = None
+
+    def __del__(self) -> None:
+        # Dropped without calling close(), give the device back and let the threads exit.
+        if getattr(self, "stream", None) is not None:
+            self.stream.close()
+        if getattr(self, "_jobs", None) is not None:
+            self._jobs.put(None)
+        if getattr(self, "_callback_queue", None) is not None:
+            self._callback_queue.put(None)
 
     async def abort(self) -> None:
         """
-        Clears the queue which in turn causes all audio to stop playing. This does not actually stop the stream.
+        Clears the buffer which in turn causes all audio to stop playing. This does not actually stop the stream.
+        Writers of the previous epoch (i.e., play_file or a casted input) get a InterruptedError on their next write.
         """
 
-        if self._playing:
-            self._clear_signal = True
-            self._playing_details = {}
+        self._epoch += 1
+        self._ring.clear()
+        self._playing_details = None
+        self._playing_details_dict = None
 
-        while self._playing:
-            await asyncio.sleep(0.001)
+        await asyncio.get_event_loop().run_in_executor(None, self._idle_evt.wait)
 
     def stop_cast(self) -> None:
         """Stop the currently casted input if there is any."""
@@ -160,7 +321,7 @@ class OutputTrack:
         """
         Direct all data of the provided input track to this output track.
         This is a non blocking function that runs in the background.
-        Casting can be stopped by calling `cast_stop()`
+        Casting can be stopped by calling `cast_stop()`, aborting or stopping this track stops it as well.
 
         Notes
         -----
@@ -180,16 +341,26 @@ class OutputTrack:
         if inp._stopped:
             raise RuntimeError("input track is not running")
 
-        threading.Thread(target=self.__cast_input__, args=(inp,), daemon=True).start()
+        self._cast_thread = threading.Thread(
+            target=self.__cast_input__, args=(inp,), daemon=True
+        )
+        self._cast_thread.start()
 
     def __cast_input__(self, inp: InputTrack) -> None:
+        # Like play_file, the cast ends once it's aborted.
+        epoch = self.epoch
         while not self._stop_cast_signal:
+            # Block until the input has captured something new, the timeout is there so the stop signal is still noticed.
+            inp.wait(0.1)
             frame = inp.read()
             if inp._stopped:
                 break
 
             if frame is not None:
-                self.write(frame)
+                try:
+                    self.write(frame, epoch=epoch)
+                except InterruptedError:
+                    break
 
         self._stop_cast_signal = False
 
@@ -200,6 +371,8 @@ class OutputTrack:
         resample: bool = False,
         resampling_method: str = "soxr_vhq",
         original_samplerate: int = None,
+        apply_effects: bool = True,
+        epoch: int = None,
     ) -> bool:
         """
         Write the provided data into the buffer (i.e., play it on the speakers).
@@ -209,30 +382,32 @@ class OutputTrack:
         `data` : np.ndarray
             The data to write.
         `wait` : bool
-            Wait for there to be a space in the queue. Defaults to True. If this is False, this function returns instantly.
+            Wait for there to be space in the buffer. Defaults to True. If this is False, this function returns instantly.
         `resample` : bool
             Whether to resample the given data to match this track's samplerate. Defaults to False. If this is true, you have to provide the original samplerate via the `original_samplerate` parameter.
         `resampling_method` : str
             Method to use for resampling. Read more about it on `resample()`'s docstring. Defaults to "soxr_vhq".
         `original_samplerate` : int
             The samplerate of the provided data. You only need this parameter if `resample` is True.
+        `apply_effects` : bool
+            Whether to apply the effects in `effect_parameters` to the provided data (only if `apply_basic_fx` is True). Defaults to True. The volume is not one of them, that one is always applied during playback.
+        `epoch` : int
+            The value of `epoch` from when you started writing. Defaults to None. If this is provided and abort() has been called since, the data is dropped and a InterruptedError is raised.
 
         Returns
         -------
         `bool` :
-            Whether putting it in the queue was successfull. If wait is True, this is usually always True. This will be False if wait is False and the queue is somehow full at the of calling this write() method.
+            Whether putting it in the buffer was successfull. If wait is True, this is usually always True. This will be False if wait is False and there isn't enough space in the buffer at the time of calling this write() method, if the callback returned None, or if the track is being stopped (i.e., stop() hasn't returned yet).
 
         Raises
         ------
         `InterruptedError` :
-            Raised when abort() get's called. How abort() basically works is that it first sends the clear signal, now once this function is called, we check if the clear signal has been sent and if it has been sent then it raises a InterruptedError, telling the caller that it's time to stop writing frames. (oh and it also clears the queue)
+            Raised when `epoch` is provided and abort() has been called since, telling the caller that it's time to stop writing frames.
         `ValueError` :
             Raised when `resample` is True but `original_samplerate` was not provided.
         """
 
-        if self._clear_signal:
-            self.q.queue.clear()
-            self._clear_signal = False
+        if epoch is not None and epoch != self._epoch:
             raise InterruptedError
 
         if resample:
@@ -240,12 +415,41 @@ class OutputTrack:
                 raise ValueError("original_samplerate must be provided")
             data = self.resample(data, original_samplerate, resampling_method)
 
-        try:
-            self.q.put(data, block=wait)
-            return True
-        except queue.Full:
+        data = self._to_float32(data)
+        if data.ndim == 1:
+            data = data.reshape(-1, 1)
+
+        if self.callback:
+            if not data.flags.writeable:
+                # e.g., a memory mapped cache, the callback is allowed to modify it in place
+                data = data.copy()
+            data = self.callback(self, data)
+            if data is None:
+                return False
+        written = self._buffer(data, wait, apply_effects)
+
+        if epoch is not None and epoch != self._epoch:
+            # abort() was called while this was being written, get rid of what got through.
+            self._ring.clear()
+            raise InterruptedError
+        return written
+
+    def _buffer(
+        self, data: np.ndarray, wait: bool = True, apply_effects: bool = True
+    ) -> bool:
+        # The part of write() after the callback, also used for the audio the callback returns while nothing is playing.
+        if self._stop_signal:
+            # The track is being stopped
             return False
 
+        data = self._to_float32(data)
+        if data.ndim == 1:
+            data = data.reshape(-1, 1)
+
+        if self.apply_basic_fx and apply_effects:
+            data = self._apply_effects(data)
+        return self._ring.write(data, wait)
+
     def resample(
         self, data: np.ndarray, original: int, type_: str = "soxr_vhq"
     ) -> np.ndarray:
@@ -259,7 +463,7 @@ class OutputTrack:
         `original` : int
             The original samplerate.
         `type_` : str
-            Resampling method. Refer to [libora.resample's](https://librosa.org/doc/main/generated/librosa.resample.html) documentation.
+            Resampling method. Refer to [libora.resample's](https://librosa.org/doc/main/generated/librosa.resample.html) documentation. The "soxr_*" and "polyphase" methods are done directly (all channels at once) instead of through librosa.
 
         Returns
         -------
@@ -267,10 +471,65 @@ class OutputTrack:
             The resample audio data.
         """
 
-        data = np.swapaxes(data, -1, 0)
-        data = librosa.resample(data, original, self.stream.samplerate, type_)
-        data = np.swapaxes(data, 0, -1)
-        return data
+        dtype = data.dtype
+        target = self.stream.samplerate
+
+        if type_.startswith("soxr_"):
+            # soxr takes (frames, channels) as it is, librosa would resample channel by channel.
+            quality = type_[len("soxr_") :].upper()
+            if len(data) <= 65536:
+                data = soxr.resample(data, original, target, quality=quality)
+            else:
+                data = self._resample_stream(data, original, target, quality)
+        elif type_ == "polyphase":
+            g = math.gcd(int(original), int(target))
+            up, down = int(target) // g, int(original) // g
+            if up == down:
+                # Nothing to resample (there's no filter below Nyquist for a ratio of 1), resample_poly returns a copy as well.
+                return np.array(data, dtype=dtype, order="C")
+
+            data = polyphase_resample(data, up, down)
+        else:
+            data = librosa.resample(
+                data,
+                orig_sr=original,
+                target_sr=target,
+                res_type=type_,
+                axis=0,
+            )
+
+        # librosa resamples along the last axis internally and hands back a transposed view (and upfirdn returns float64 for float64 input),
+        # make it contiguous and of the original data type once here so that the chunks of it are as well.
+        return np.ascontiguousarray(data, dtype=dtype)
+
+    def _resample_stream(
+        self,
+        data: np.ndarray,
+        original: int,
+        target: int,
+        quality: str,
+        size: int = 65536,
+    ) -> np.ndarray:
+        # Long inputs go through a resampling stream `size` frames at a time, straight into one preallocated output.
+        # Only a chunk worth of intermediate data is around at once instead of the entire file, the result is the same
+        # as soxr.resample's.
+        channels = data.shape[1] if data.ndim > 1 else 1
+        stream = soxr.ResampleStream(
+            original, target, channels, dtype=data.dtype, quality=quality
+        )
+
+        # sounddevice reports the samplerate as a float
+        frames = -(-len(data) * int(target) // int(original))
+        out = np.empty((frames,) + data.shape[1:], dtype=data.dtype)
+        offset = 0
+        for i in range(0, len(data), size):
+            chunk = stream.resample_chunk(
+                data[i : i + size], last=i + size >= len(data)
+            )
+            n = min(len(chunk), len(out) - offset)
+            out[offset : offset + n] = chunk[:n]
+            offset += n
+        return out[:offset]
 
     def chunk_split(self, data: np.ndarray, size: int = 512) -> List[np.ndarray]:
         """
@@ -289,11 +548,161 @@ class OutputTrack:
             The list of ndarrays.
         """
 
-        n = len(data) / size
-        if n < 1:
-            n = 1
+        return list(self._iter_chunks(data, size))
+
+    def _cache_path(self, path: str, params: dict = None) -> str:
+        # Where the decoded audio of `path` (as played by this track, so at its samplerate and with its channels) is cached.
+        # It's always stored as float32 (the data type of the buffer) so playing it back doesn't have to convert anything.
+        # The modification time is part of the key so a changed file is never played from an outdated cache, so are the
+        # soundfile parameters in `params` that change what gets decoded (e.g., start, stop or frames).
+        Path(self.conversion_path).mkdir(parents=True, exist_ok=True)
+        params = sorted(
+            (k, v)
+            for k, v in (params or {}).items()
+            if k not in ("always_2d", "dtype", "blocksize", "out")
+        )
+        key = "|".join(
+            str(x)
+            for x in (
+                os.path.abspath(path),
+                os.stat(path).st_mtime_ns,
+                self.stream.samplerate,
+                self.stream.channels,
+                *params,
+            )
+        )
+        digest = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+        return os.path.join(self.conversion_path, f"{digest}.pcm")
+
+    def _read_cache(self, cache: str) -> Union[None, np.ndarray]:
+        # The cache file at `cache` memory mapped (the OS only reads the parts that are actually being played), None if there is none.
+        # An empty file can't be memory mapped, it counts as a miss.
+        try:
+            if not os.path.getsize(cache):
+                return None
+        except OSError:
+            return None
+        return np.memmap(cache, dtype=np.float32, mode="r").reshape(
+            -1, self.stream.channels
+        )
+
+    def _write_cache(self, cache: str, data: np.ndarray) -> None:
+        # Write `data` into the cache file at `cache`. It's written into a temporary file first and only moved into place
+        # once all of it is written, so a failed write never leaves a partial cache file (or the temporary one) behind.
+        if not len(data):
+            return
+
+        tmp = f"{cache}.{threading.get_ident()}.tmp"
+        try:
+            np.ascontiguousarray(data, dtype=np.float32).tofile(tmp)
+            os.replace(tmp, cache)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    async def _convert(self, path: str) -> str:
+        # Convert the provided file into a .wav file under the conversion path with FFmpeg, returns the path of the .wav file.
+        Path(self.conversion_path).mkdir(parents=True, exist_ok=True)
+
+        # The hash of the full path keeps files with the same name from different directories apart.
+        digest = hashlib.blake2b(
+            os.path.abspath(path).encode(), digest_size=4
+        ).hexdigest()
+        out = os.path.basename(path).split(".")[0] + f"-{digest}.wav"
+        out = os.path.join(self.conversion_path, out)
+
+        # Only convert if there isn't an up to date conversion already
+        if not os.path.exists(out) or os.path.getmtime(out) < os.path.getmtime(path):
+            # Converted into a temporary file first so an interrupted conversion is never reused.
+            tmp = out[: -len(".wav")] + ".tmp.wav"
+            if av is not None:
+                run = functools.partial(self._decode_av, path, tmp)
+            else:
+                run = ffmpy.FFmpeg(
+                    inputs={path: None},
+                    outputs={tmp: None},
+                    global_options=["-loglevel", "quiet", "-y"],
+                ).run
+
+            # Run it in a thread so the event loop isn't blocked while converting.
+            await asyncio.get_event_loop().run_in_executor(None, run)
+            os.replace(tmp, out)
+        return out
+
+    def _decode_av(self, path: str, out: str) -> None:
+        # Decode `path` with PyAV into a float .wav file at `out`, frame by frame so the whole file is never in memory at once.
+        # The samplerate and channels are kept as they are, resampling and channel matching happen later like for any other file.
+        with av.open(path) as container:
+            stream = container.streams.audio[0]
+            channels = len(stream.layout.channels)
+            resampler = av.AudioResampler(
+                format="flt", layout=stream.layout, rate=stream.rate
+            )
+
+            with sf.SoundFile(
+                out, "w", stream.rate, channels, subtype="FLOAT", format="WAV"
+            ) as f:
+                frames = container.decode(stream)
+                for frame in itertools.chain(frames, [None]):
+                    # A None frame flushes the resampler
+                    for decoded in resampler.resample(frame):
+                        # Packed float frames come out as (1, samples * channels)
+                        f.write(decoded.to_ndarray().reshape(-1, channels))
+
+    def _match_channels(self, d: np.ndarray) -> np.ndarray:
+        # Match the number of channels of this track.
+        try:
+            channel_count = d.shape[1]
+        except IndexError:
+            channel_count = 1
+
+        if channel_count != self.stream.channels:
+            if (channel_count == 1) and (self.stream.channels == 2):
+                # Broadcast view, the samples only get duplicated once they are copied into the buffer.
+                return np.broadcast_to(d.reshape(-1, 1), (d.shape[0], 2))
+            # Downmixed (or spread out) once here, the callback only ever sees this track's channels.
+            mixed = np.matmul(d, channel_matrix(channel_count, self.stream.channels))
+            if d.dtype.kind in "iu":
+                info = np.iinfo(d.dtype)
+                mixed = np.clip(mixed, info.min, info.max, out=mixed)
+            d = mixed.astype(d.dtype, copy=False)
+        return d
+
+    def _to_float32(self, d: np.ndarray) -> np.ndarray:
+        # The buffer holds float32, integer samples (e.g., from an int16 InputTrack) are normalized to [-1.0, 1.0].
+        # Data that already is float32 is returned as it is.
+        if d.dtype.kind in "iu":
+            return np.divide(d, np.iinfo(d.dtype).max, dtype=np.float32)
+        if d.dtype != np.float32:
+            return d.astype(np.float32)
+        return d
+
+    def _fade(
+        self, d: np.ndarray, pos: int, total: int, fade_in: bool, fade_out: bool
+    ) -> np.ndarray:
+        # Put the fades on the chunk `d` starting at frame `pos` of a file that's `total` frames long.
+        # Only the chunks at the very start and end are touched (and copied, they may be read-only views).
+        n = len(self._fade_in)
+        head = min(n - pos, len(d)) if fade_in else 0
+        tail = max(total - n - pos, 0) if fade_out else len(d)
+        if head <= 0 and tail >= len(d):
+            return d
 
-        return np.array_split(data, n)
+        d = np.array(d, dtype=np.float32).reshape(len(d), -1)
+        if head > 0:
+            d[:head] *= self._fade_in[pos : pos + head]
+        if tail < len(d):
+            start = pos + tail - (total - n)
+            envelope = self._fade_out[start : start + len(d) - tail]
+            d[tail : tail + len(envelope)] *= envelope
+            # Past the (estimated) end of the file
+            d[tail + len(envelope) :] = 0.0
+        return d
+
+    def _iter_chunks(self, data: np.ndarray, size: int = 512) -> Iterator[np.ndarray]:
+        """Same as chunk_split but yields views of `data` one by one instead of building a list."""
+        for i in range(0, len(data), size):
+            yield data[i : i + size]
 
     async def play_file(
         self,
@@ -301,9 +710,9 @@ class OutputTrack:
         blocking: bool = False,
         resample: bool = True,
         chunk_size: int = 512,
-        load_in_memory: bool = True,
+        load_in_memory: bool = False,
         play_count: int = 1,
-        **kwargs
+        **kwargs,
     ) -> None:
 
         """
@@ -311,7 +720,7 @@ class OutputTrack:
 
         Notes
         -----
-        - Keep in mind, this method loads the entire audio file into memory. It is only released once the audio is done playing.
+        - Keep in mind, if `load_in_memory` is True this method loads the entire audio file into memory. It is only released once the audio is done playing. Otherwise the file is decoded (and resampled) block by block while it plays.
         - FFmpeg will be used for converting files into .wav files if the provided format is not supported.
 
         Parameters
@@ -325,7 +734,7 @@ class OutputTrack:
         `chunk_size` : int
             The entire audio data is split into chunks. This defines the length of each chunk. Defaults to 512.
         `load_in_memory` : bool
-            Whether to load the entire file to memory. Defaults to True.
+            Whether to load the entire file to memory. Defaults to False, so the file is streamed block by block (blocks of this track's blocksize unless a `blocksize` is passed through **kwargs) which keeps memory usage bounded no matter how long the file is.
         `play_count` : int
             How many times to play the audio. Defaults to 1.
         **kwargs :
@@ -334,57 +743,41 @@ class OutputTrack:
 
         # Stop whatever is playing (if there is any)
         await self.abort()
+        epoch = self._epoch
 
         if "always_2d" not in kwargs.keys():
             kwargs["always_2d"] = True
 
         if "dtype" not in kwargs.keys():
+            # Same data type as the buffer, so decoded blocks don't have to be converted before they're written
             kwargs["dtype"] = "float32"
 
-        if not load_in_memory:
-
-            target_sr = self.stream.samplerate
+        if not load_in_memory and "blocksize" not in kwargs.keys():
+            # Decode in blocks the same size as the ones the stream plays
+            kwargs["blocksize"] = self.stream.blocksize
 
-            # Automatically figure out the best blocksize and resampling method
-            if "blocksize" not in kwargs.keys():
-                if target_sr >= 88200:
-                    kwargs["blocksize"] = 6192
-                else:
-                    kwargs["blocksize"] = 512
-
-            if (target_sr >= 8000) and (target_sr <= 22050):
-                resampling_type = "soxr_qq"
-            elif ((target_sr >= 44100) and (target_sr <= 48000)) or target_sr >= 176400:
-                resampling_type = "fft"
-            elif (target_sr >= 88200) and (target_sr <= 96000):
-                resampling_type = "linear"
-            else:
-                resampling_type = "soxr_vhq"
-
-        load_method = {True: sf.read, False: sf.blocks}
+        # Decoded and resampled audio is cached under the conversion path, a hit skips decoding and resampling entirely.
+        cache = None
+        data = None
+        if resample and self.conversion_path:
+            cache = self._cache_path(path, kwargs)
+            data = self._read_cache(cache)
+        cached = data is not None
 
         try:
-            data = load_method[load_in_memory](path, **kwargs)
-            if load_in_memory:
-                data, samplerate = data
+            if cached:
+                samplerate = self.stream.samplerate
+                duration = len(data) / samplerate
             else:
-                _, samplerate = sf.read(path, frames=1)
+                # Only the header is read here, decoding (and resampling) is left to the feeder thread.
+                info = sf.info(path)
+                samplerate = info.samplerate
+                duration = info.duration
         except RuntimeError as e:
             if not self.conversion_path:
                 raise UnsupportedFormat(e)
 
-            # Create if the directory to the conversion path does not exist
-            Path(self.conversion_path).mkdir(parents=True, exist_ok=True)
-            out = os.path.basename(path).split(".")[0] + ".wav"
-            out = os.path.join(self.conversion_path, out)
-
-            ff = ffmpy.FFmpeg(
-                inputs={path: None},
-                outputs={out: None},
-                global_options=["-loglevel", "quiet", "-y"],
-            )
-
-            ff.run()
+            out = await self._convert(path)
             return await self.play_file(
                 out,
                 blocking,
@@ -392,101 +785,292 @@ class OutputTrack:
                 chunk_size,
                 load_in_memory,
                 play_count,
-                **kwargs
+                **kwargs,
             )
 
-        def match_channels(d):
-            # Match the number of channels of this track.
+        def _chunks(frames):
+            if frames is not None:
+                size = chunk_size if load_in_memory else kwargs["blocksize"]
+                yield from self._iter_chunks(frames, size)
+                return
+
+            # A resampling stream keeps the filter state from one block to the next
+            # so there are no discontinuities at the block boundaries.
+            resampler = None
+            if resample and samplerate != self.stream.samplerate:
+                resampler = soxr.ResampleStream(
+                    samplerate,
+                    self.stream.samplerate,
+                    info.channels,
+                    dtype=kwargs["dtype"],
+                    quality="VHQ",
+                )
+
+            # Decode every block into the same buffer (sf.blocks hands out a copy of each block otherwise),
+            # every block is done with (copied into the ring buffer) before the next one gets decoded.
+            params = {k: v for k, v in kwargs.items() if k != "blocksize"}
+            shape = (kwargs["blocksize"], info.channels)
+            block = self._decode_block
+            if block is None or block.shape != shape or block.dtype != kwargs["dtype"]:
+                block = self._decode_block = np.empty(shape, dtype=kwargs["dtype"])
+
+            def _blocks():
+                for d in sf.blocks(path, out=block, **params):
+                    if resampler is not None:
+                        d = resampler.resample_chunk(d)
+                    yield self._to_float32(self._match_channels(d))
+
+                if resampler is not None:
+                    d = resampler.resample_chunk(
+                        np.empty((0, info.channels), dtype=kwargs["dtype"]), last=True
+                    )
+                    yield self._to_float32(self._match_channels(d))
+
+            if cache is None:
+                yield from _blocks()
+                return
+
+            # Fill the cache while playing, it's only moved into place if the whole file made it through (and it isn't empty).
+            # Otherwise (e.g., playback was aborted and this generator closed) the partial file is deleted.
+            tmp = f"{cache}.{id(self)}.tmp"
             try:
-                channel_count = d.shape[1]
-            except IndexError:
-                channel_count = 1
-
-            if channel_count != self.stream.channels:
-                if (channel_count == 1) and (self.stream.channels == 2):
-                    channel_count = 2
-                d = np.repeat(d, channel_count, axis=-1)
-            return d
-
-        if load_in_memory:
-            data = match_channels(data)
-
-            if resample:
-                # Match the samplerate of this track
-                data = self.resample(data, samplerate)
-            data = self.chunk_split(data, chunk_size)
+                with open(tmp, "wb") as fh:
+                    for d in _blocks():
+                        d.tofile(fh)
+                        yield d
+                    written = fh.tell()
+                if written:
+                    os.replace(tmp, cache)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
 
         def _write():
+            frames = data
+            if load_in_memory and not cached:
+                frames, _ = sf.read(path, **kwargs)
+                if resample:
+                    # Match the samplerate of this track
+                    frames = self.resample(frames, samplerate)
+                frames = self._to_float32(self._match_channels(frames))
+
+            if load_in_memory and cache is not None and not cached:
+                self._write_cache(cache, frames)
+
+            if load_in_memory and self.apply_basic_fx:
+                # Apply the effects on the entire file once instead of on every chunk
+                frames = self._apply_effects(frames)
+
+            if frames is not None:
+                total = len(frames)
+            else:
+                # Streamed, close enough for where the fade out starts
+                total = (
+                    round(info.frames * self.stream.samplerate / samplerate)
+                    if resample
+                    else info.frames
+                )
+
             i = 0
             while play_count != i:
                 print("Playing first")
-                for d in data:
-                    try:
-
-                        if not load_in_memory:
-                            d = match_channels(d)
-                            if resample:
-                                d = self.resample(d, samplerate, resampling_type)
-
-                        self.write(d)
-                    except (KeyboardInterrupt, InterruptedError):
-                        return
+                pos = 0
+                chunks = _chunks(frames)
+                try:
+                    for d in chunks:
+                        # Fade in on the first play and out on the last one, so repeating the file stays seamless.
+                        d = self._fade(
+                            d, pos, total, fade_in=i == 0, fade_out=i == play_count - 1
+                        )
+                        pos += len(d)
+                        self.write(d, apply_effects=not load_in_memory, epoch=epoch)
+                except (KeyboardInterrupt, InterruptedError):
+                    return
+                finally:
+                    # Runs the cleanup of an unfinished streamed cache file right away
+                    chunks.close()
+
+                if frames is None and cache is not None:
+                    # The first pass filled the cache, the next ones play from it instead of decoding again.
+                    frames = self._read_cache(cache)
 
                 print("Playing again", i, play_count)
                 i += 1
 
         # Assign playing details
         __detail_sr = self.stream.samplerate if resample else samplerate
-        self._playing_details = {
-            "file": path,
-            "duration": librosa.get_duration(filename=path, sr=__detail_sr),
-            "samplerate": __detail_sr,
-            "read": 0,  # How many seconds were already read
-        }
+        self._playing_details = PlayingDetails(
+            file=path,
+            duration=duration,
+            samplerate=__detail_sr,
+            channels=self.stream.channels,
+        )
+        self._playing_details_dict = self._playing_details._asdict()
 
+        loop = asyncio.get_event_loop()
+        future = concurrent.futures.Future()
+        self._jobs.put((_write, future))
         if blocking:
-            _write()
-            while self._playing:
-                await asyncio.sleep(0.001)
+            await asyncio.wrap_future(future)
+            await loop.run_in_executor(None, self._idle_evt.wait)
+            return
+
+        # Wait for the file to start playing, unless the job is over before that (it failed, or it didn't write anything).
+        await loop.run_in_executor(None, self._wait_playing, future)
+        if future.done():
+            future.result()
         else:
-            threading.Thread(target=_write, daemon=True).start()
-            while not self._playing:
-                await asyncio.sleep(0.001)
+            # Nobody is awaiting it anymore, have whatever goes wrong from here on at least printed
+            future.add_done_callback(self._print_exception)
+
+    async def cache_file(self, path: str) -> str:
+        """
+        Decode and resample the provided audio file into the cache under `conversion_path` without playing it, so a later play_file (with `resample` set to True) starts straight from the cache.
+        The work is done outside of the event loop, so several files can be cached at once (e.g., with asyncio.gather).
 
-    def _apply_basic_fx(self, data: np.ndarray) -> np.ndarray:
+        Parameters
+        ----------
+        `path` : str
+            Path.
+
+        Returns
+        -------
+        `str` :
+            Path of the cache file.
+
+        Raises
+        ------
+        `ValueError` :
+            Raised when this track has no `conversion_path`.
+        """
+
+        if not self.conversion_path:
+            raise ValueError("conversion_path must be provided to cache files")
+
+        try:
+            sf.info(path)
+        except RuntimeError:
+            path = await self._convert(path)
+
+        cache = self._cache_path(path)
+        if self._read_cache(cache) is not None:
+            return cache
+
+        def _cache():
+            data, samplerate = sf.read(path, dtype="float32", always_2d=True)
+            self._write_cache(
+                cache, self._match_channels(self.resample(data, samplerate))
+            )
+
+        await asyncio.get_event_loop().run_in_executor(None, _cache)
+        return cache
+
+    def _apply_effects(self, data: np.ndarray) -> np.ndarray:
+        # Every effect except the volume. These run on the producer's side (i.e., in write()) so the playback thread doesn't have to.
         for f in self.basicfx.effects:
             params = self.effect_parameters.get(f.__name__)
-            if params is not None:
+            if params is not None and f.__name__ != "set_volume":
                 data = f(data, **params)
         return data
 
-    def __start__(self) -> None:
-        with sd.OutputStream(**self.sounddevice_parameters) as f:
-            self._stopped = False
-            self.stream = f
-            while not self._stop_signal:
-                try:
-                    data = self.q.get(block=False)
-                except queue.Empty:
-                    data = None
+    def _update_gain(self) -> None:
+        # The gain the callback applies (1.0 if the basic effects are off) and the matching _render variant, picked here
+        # once instead of branching on them for every block.
+        self._gain_arr[0] = (
+            self.basicfx.gain(self.volume) if self.apply_basic_fx else 1.0
+        )
 
-                # Call the callback (yes even if it's None)
-                if self.callback:
-                    data = self.callback(self, data)
+        if self._iinfo is not None:
+            self._render = self._render_int
+        elif self._gain_arr[0] != 1.0:
+            self._render = self._render_float
+        else:
+            self._render = self._render_unity
+
+    def _render_unity(self, data: np.ndarray, outdata: np.ndarray) -> None:
+        # Float stream at unity gain, the buffer was already read straight into `outdata`.
+        pass
+
+    def _render_float(self, data: np.ndarray, outdata: np.ndarray) -> None:
+        # Float stream, apply the volume in place.
+        np.multiply(data, self._gain_arr[0], out=outdata[: len(data)])
+
+    def _render_int(self, data: np.ndarray, outdata: np.ndarray) -> None:
+        # Integer stream. The volume gain and the integer scale are folded into a single multiplier into the float scratch
+        # block, then it's clipped and converted to the stream's data type straight into `outdata` in the same pass.
+        n = len(data)
+        scratch = self._scratch[:n]
+        np.multiply(data, self._gain_arr[0] * self._iinfo.max, out=scratch)
+        np.clip(
+            scratch, self._iinfo.min, self._iinfo.max, out=outdata[:n], casting="unsafe"
+        )
 
+    def _wait_playing(
+        self, future: concurrent.futures.Future, interval: float = 0.05
+    ) -> None:
+        # Block until this track is playing or `future` is done, whichever comes first.
+        while not self._playing_evt.wait(interval):
+            if future.done():
+                return
+
+    @staticmethod
+    def _print_exception(future: concurrent.futures.Future) -> None:
+        e = future.exception()
+        if e is not None:
+            traceback.print_exception(type(e), e, e.__traceback__)
+
+    @staticmethod
+    def __feed__(jobs: queue.Queue) -> None:
+        # The fades and effects run on this thread
+        flush_denormals()
+        for job, future in iter(jobs.get, None):
+            if future.set_running_or_notify_cancel():
+                # Hand the result (or the exception) to whoever is waiting for this one
+                try:
+                    future.set_result(job())
+                except Exception as e:
+                    future.set_exception(e)
+
+    @staticmethod
+    def __notify__(ref: weakref.ref, notifications: queue.SimpleQueue) -> None:
+        # Only holds on to the track while calling its callback, so the track can still be garbage collected.
+        while notifications.get() is not None:
+            track = ref()
+            if track is None:
+                return
+            try:
+                data = track.callback(track, None)
                 if data is not None:
-                    self._playing = True
-
-                    if self.apply_basic_fx:
-                        data = self._apply_basic_fx(data)
-
-                    f.write(data)
-                else:
-                    self._playing = False
-
-                time.sleep(0.001)
-
-        """This code is only reached once the stop signal is True. (i.e., track has been stopped)"""
-        self._stopped = True
-        self.stream = None
-        self._stop_signal = False
+                    # Played like written data, only without calling the callback with it again
+                    track._buffer(data)
+            except Exception:
+                traceback.print_exc()
+            del track
+
+    def __callback__(self, outdata: np.ndarray, frames: int, time, status) -> None:
+        # Called by PortAudio every time it needs the next block, nothing in here allocates.
+        # Float streams read the buffer straight into `outdata`, integer streams go through the float32 block first.
+        flush_denormals()
+        target = outdata if self._iinfo is None else self._block
+        n = self._ring.readinto(target[:frames])
+        data = target[:n] if n else None
+
+        if data is None:
+            # Have the callback called with None, unless the previous notification is still pending
+            notifications = self._callback_queue
+            if self.callback and notifications is not None and notifications.empty():
+                notifications.put_nowait(True)
+
+            outdata[:] = self._silence[:frames]
+            if self._playing_evt.is_set():
+                self._playing_evt.clear()
+                self._idle_evt.set()
+            return
+
+        if not self._playing_evt.is_set():
+            self._idle_evt.clear()
+            self._playing_evt.set()
+        self._render(data, outdata)
+
+        if n < frames:
+            outdata[n:] = self._silence[: frames - n]
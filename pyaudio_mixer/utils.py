@@ -1,7 +1,13 @@
-import math
+import ctypes
+import ctypes.util
+import functools
+import platform
+import threading
+from typing import Tuple
 
 import noisereduce
 import numpy as np
+import scipy.signal
 from pedalboard import (
     Chorus,
     Compressor,
@@ -15,6 +21,120 @@ from pedalboard import (
 )
 
 
+# Flush-to-zero and denormals-are-zero bits of the SSE control and status register (MXCSR).
+_MXCSR_FTZ = 0x8000
+_MXCSR_DAZ = 0x0040
+_libm = None
+if (
+    platform.system() == "Linux"
+    and platform.machine() == "x86_64"
+    and platform.libc_ver()[0] == "glibc"
+):
+    try:
+        _libm = ctypes.CDLL(ctypes.util.find_library("m"))
+    except OSError:
+        pass
+_fpu = threading.local()
+
+
+def flush_denormals() -> None:
+    """
+    Have the calling thread flush denormal float results to zero and treat denormal inputs as zero (FTZ/DAZ), only the first call of each thread does anything.
+    Denormals (e.g., in long fade out tails) are many times slower to compute with on x86. This does nothing on anything but x86-64 Linux with glibc.
+    """
+
+    if _libm is None or getattr(_fpu, "flushed", False):
+        return
+    _fpu.flushed = True
+
+    # glibc's x86-64 fenv_t is the 28 byte x87 environment followed by MXCSR, fesetenv loads all of MXCSR from it.
+    env = (ctypes.c_uint32 * 8)()
+    if _libm.fegetenv(env) == 0:
+        env[7] |= _MXCSR_FTZ | _MXCSR_DAZ
+        _libm.fesetenv(env)
+
+
+@functools.lru_cache(maxsize=None)
+def polyphase_filter(up: int, down: int) -> Tuple[np.ndarray, int]:
+    """
+    The anti-aliasing FIR filter scipy.signal.resample_poly would design for the provided ratio (a Kaiser window with a beta of 5.0),
+    already scaled and padded the way resample_poly does it, along with how many leading output frames of scipy.signal.upfirdn to drop to undo its delay.
+    Designing the filter is the most expensive part of resample_poly for short inputs, so it's only done once per ratio.
+    """
+
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    h = scipy.signal.firwin(2 * half_len + 1, 1.0 / max_rate, window=("kaiser", 5.0))
+    h = h * (up / h.sum())
+
+    # Pad the front so the delay is a whole number of output frames
+    n_pre_pad = down - half_len % down
+    h = np.concatenate([np.zeros(n_pre_pad), h]).astype(np.float32)
+    h.flags.writeable = False
+    return h, (half_len + n_pre_pad) // down
+
+
+def polyphase_resample(data: np.ndarray, up: int, down: int) -> np.ndarray:
+    """
+    Resample `data` (with shape of (frames, channels)) by a factor of `up` / `down` like scipy.signal.resample_poly does, minus designing the filter each time and the float64 round trip.
+    The result is float32 for float32 input, float64 otherwise.
+    """
+
+    h, offset = polyphase_filter(up, down)
+    n_out = -(-len(data) * up // down)
+    data = scipy.signal.upfirdn(h, data, up, down, axis=0)[offset : offset + n_out]
+    if len(data) < n_out:
+        # What upfirdn would have produced with a longer (zero padded) filter
+        data = np.pad(data, [(0, n_out - len(data))] + [(0, 0)] * (data.ndim - 1))
+    return data
+
+
+# Where each channel of the common layouts goes when downmixed to stereo (ITU-R BS.775), as (left, right) gains.
+# The layouts follow the WAV channel order, that's also what FFmpeg converts to.
+_CENTER = (0.707, 0.707)
+_LEFT = (1.0, 0.0)
+_RIGHT = (0.0, 1.0)
+_SURROUND_LEFT = (0.707, 0.0)
+_SURROUND_RIGHT = (0.0, 0.707)
+_LFE = (0.0, 0.0)
+_STEREO_DOWNMIX = {
+    3: (_LEFT, _RIGHT, _CENTER),
+    4: (_LEFT, _RIGHT, _SURROUND_LEFT, _SURROUND_RIGHT),
+    5: (_LEFT, _RIGHT, _CENTER, _SURROUND_LEFT, _SURROUND_RIGHT),
+    6: (_LEFT, _RIGHT, _CENTER, _LFE, _SURROUND_LEFT, _SURROUND_RIGHT),
+    7: (_LEFT, _RIGHT, _CENTER, _LFE, _CENTER, _SURROUND_LEFT, _SURROUND_RIGHT),
+    8: (
+        _LEFT,
+        _RIGHT,
+        _CENTER,
+        _LFE,
+        _SURROUND_LEFT,
+        _SURROUND_RIGHT,
+        _SURROUND_LEFT,
+        _SURROUND_RIGHT,
+    ),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def channel_matrix(source: int, target: int) -> np.ndarray:
+    """
+    A (source, target) float32 matrix that maps audio with `source` channels to `target` channels when multiplied with it (`data @ matrix`).
+    Surround layouts are downmixed to stereo with the ITU-R BS.775 coefficients, mono averages every channel and anything else wraps the channels around.
+    """
+
+    if target == 2 and source in _STEREO_DOWNMIX:
+        return np.array(_STEREO_DOWNMIX[source], dtype=np.float32)
+
+    matrix = np.zeros((source, target), dtype=np.float32)
+    if target == 1:
+        matrix[:] = 1.0 / source
+    else:
+        for i in range(max(source, target)):
+            matrix[i % source, i % target] = 1.0
+    return matrix
+
+
 class BasicFX:
 
     """
@@ -52,12 +172,37 @@ class BasicFX:
         self.dtype = dtype
         self.samplerate = samplerate
 
-    def set_volume(self, data: np.ndarray, factor: float) -> np.ndarray:
-        """Increase the volume of the provided audio data by a factor of `float`"""
+        # Last volume factor and its gain, the gain only has to be recomputed when the factor changes.
+        self._factor = 1.0
+        self._gain = 1.0
+
+    def gain(self, factor: float) -> float:
+        """Get the multiplier set_volume uses for the provided volume factor."""
+        if factor != self._factor:
+            if factor < 0:
+                raise ValueError("volume factor can't be negative")
+
+            # Same as 2 ** ((sqrt(sqrt(sqrt(factor))) * 192 - 192) / 6)
+            self._gain = 2.0 ** (factor**0.125 * 32.0 - 32.0)
+            self._factor = factor
+        return self._gain
+
+    def set_volume(
+        self, data: np.ndarray, factor: float, out: np.ndarray = None
+    ) -> np.ndarray:
+        """Increase the volume of the provided audio data by a factor of `float`. If `out` is provided, the result is written into it instead of a new array."""
+
+        gain = self.gain(factor)
+        if gain == 1.0 and out is None and data.dtype == self.dtype:
+            return data
+
+        # Only integer data (e.g., an int16 input stream) has to be truncated back into its own type.
+        casting = "same_kind" if np.dtype(self.dtype).kind == "f" else "unsafe"
         return np.multiply(
             data,
-            pow(2, (math.sqrt(math.sqrt(math.sqrt(factor))) * 192 - 192) / 6),
-            casting="unsafe",
+            gain,
+            out=out,
+            casting=casting,
             dtype=self.dtype,
         )
 
@@ -98,3 +243,121 @@ class BasicFX:
     def lowpass_filter(self, data: np.ndarray, **params) -> np.ndarray:
         board = Pedalboard([LowpassFilter(**params)])
         return board(data, self.samplerate)
+
+
+class RingBuffer:
+
+    """
+    A single producer, single consumer ring buffer of audio frames backed by a preallocated ndarray.
+
+    Notes
+    -----
+    - Only one thread may call `write()` (the producer) and only one thread may call `readinto()` (the consumer). The producer only ever moves the write index and the consumer only ever moves the read index, which is why no lock is needed.
+    - `clear()` can be called from any thread. If it's called while a write is in progress, the frames of that write may survive the clear.
+    - Nothing is allocated per write or read, frames are copied straight into or out of the preallocated buffer.
+
+    Parameters
+    ----------
+    `frames` : int
+        How many frames the buffer can hold.
+    `channels` : int
+        Number of channels of each frame.
+    `dtype` : str
+        Data type of the buffer. Written data is cast to this data type.
+    """
+
+    def __init__(self, frames: int, channels: int, dtype: str = "float32") -> None:
+        self.size = frames
+        self._buffer = np.zeros((frames, channels), dtype=dtype)
+
+        # Indices are never wrapped, the position in the buffer is the index modulo `size`.
+        self._read = 0
+        self._write = 0
+        self._flush = 0
+
+        # Set by the consumer every time it frees up space.
+        self._writable = threading.Event()
+
+    @property
+    def read_available(self) -> int:
+        """Number of frames that can be read."""
+        return self._write - max(self._read, self._flush)
+
+    @property
+    def write_available(self) -> int:
+        """Number of frames that can be written."""
+        # Discarded frames are free space too even if the consumer hasn't skipped past them yet.
+        return self.size - (self._write - max(self._read, self._flush))
+
+    def clear(self) -> None:
+        """
+        Discard everything that has been written so far. The consumer skips the discarded frames on its next read.
+        """
+        self._flush = self._write
+
+        # Wake up a producer waiting for space, the discarded frames are free now.
+        self._writable.set()
+
+    def write(self, data: np.ndarray, wait: bool = True) -> bool:
+        """
+        Write the provided frames into the buffer.
+
+        Parameters
+        ----------
+        `data` : np.ndarray
+            Audio data with shape of (frames, channels).
+        `wait` : bool
+            Wait for there to be space in the buffer. Defaults to True. If this is False and there isn't enough space for all of `data`, nothing is written.
+
+        Returns
+        -------
+        `bool` :
+            Whether the data was written.
+        """
+
+        n = len(data)
+        if not wait and self.write_available < n:
+            return False
+
+        offset = 0
+        while offset < n:
+            self._writable.clear()
+            available = self.write_available
+            if not available:
+                self._writable.wait()
+                continue
+
+            count = min(available, n - offset)
+            start = self._write % self.size
+            first = min(count, self.size - start)
+            self._buffer[start : start + first] = data[offset : offset + first]
+            self._buffer[: count - first] = data[offset + first : offset + count]
+
+            self._write += count
+            offset += count
+        return True
+
+    def readinto(self, out: np.ndarray) -> int:
+        """
+        Read as many frames as possible (up to the length of `out`) into `out`.
+
+        Returns
+        -------
+        `int` :
+            Number of frames that were read.
+        """
+
+        if self._flush > self._read:
+            self._read = self._flush
+            self._writable.set()
+
+        count = min(len(out), self._write - self._read)
+        if count:
+            start = self._read % self.size
+            first = min(count, self.size - start)
+            out[:first] = self._buffer[start : start + first]
+            out[first:count] = self._buffer[: count - first]
+
+            self._read += count
+            self._writable.set()
+        return count
@@ -2,9 +2,11 @@ import asyncio
 from tests.output import TestOutput
 from tests.input import TestInput
 from tests.mixer import TestMixer
+from tests.utils import TestUtils
 
 
 async def main() -> None:
+    await TestUtils().run()
     await TestInput().run()
     await TestOutput().run()
     await TestMixer().run()
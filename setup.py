@@ -3,13 +3,14 @@ from distutils.core import setup
 install_requires = [
     "sounddevice==0.4.4",
     "soundfile==0.10.3.post1",
-    "librosa==0.8.1",
+    "librosa>=0.9",
     "numpy",
     "ffmpy==0.3.0",
     "maglevapi",
     "pedalboard",
     "noisereduce",
     "soxr",
+    "scipy",
 ]
 
 
@@ -6,7 +6,11 @@ This test will test the output tracks.
 """
 
 import asyncio
+import glob
+import math
+import os
 import numpy as np
+from unittest import mock
 from maglevapi.testing import Testing
 from pyaudio_mixer import OutputTrack
 
@@ -76,11 +80,19 @@ class TestOutput(Testing):
         
         await t.stop()
     
+    def clear_cache(self) -> None:
+        # Remove the decoded audio cached under the conversion path (the FFmpeg conversions are kept).
+        for cache in glob.glob(os.path.join(self.conversion_path, "*.pcm")):
+            os.remove(cache)
+
     async def test_output_play_file(self) -> None:
         volume = 0.6
         t = OutputTrack("track", conversion_path=self.conversion_path, volume=volume)
         assert t.volume == volume
 
+        # Start without a cache (from a previous run) so the files are actually decoded and resampled.
+        self.clear_cache()
+
         # Test in memory, This will play all tests files for 3 seconds, one after the other.
         for f in self.test_files:
             await t.play_file(f, blocking=False, resample=True, load_in_memory=True)
@@ -101,15 +113,57 @@ class TestOutput(Testing):
         await t.abort()
 
         # Test not in memory
+        self.clear_cache()
         for f in self.test_files:
             await t.play_file(f, blocking=False, resample=True, load_in_memory=False)
             assert t._playing
             assert t.playing_details["samplerate"] == t.stream.samplerate
             await asyncio.sleep(3)
+        await t.abort()
+
+        # Decode and resample every test file up front (all at once), the play_file calls after it have to start from the cache.
+        self.clear_cache()
+        caches = await asyncio.gather(*(t.cache_file(f) for f in self.test_files))
+        assert all(os.path.getsize(cache) for cache in caches)
+
+        decoded = AssertionError("decoded instead of played from the cache")
+        with mock.patch("soundfile.read", side_effect=decoded), mock.patch(
+            "soundfile.blocks", side_effect=decoded
+        ):
+            for f in self.test_files:
+                for load_in_memory in (True, False):
+                    await t.play_file(
+                        f, blocking=False, resample=True, load_in_memory=load_in_memory
+                    )
+                    assert t._playing
+                    assert t.playing_details["samplerate"] == t.stream.samplerate
+                    await asyncio.sleep(1)
         await t.stop()
         assert not t.playing_details
         assert not t._playing
     
+    async def test_output_resample(self) -> None:
+        """Resample more than 65536 frames (soxr goes through a stream then) with float samplerates like sounddevice reports them."""
+
+        t = OutputTrack("track", sounddevice_parameters={"samplerate": 48000.0})
+        data = np.zeros((100000, 2), dtype=np.float32)
+        expected = math.ceil(len(data) * 48000 / 44100)
+
+        for method in ("soxr_vhq", "polyphase"):
+            resampled = t.resample(data, 44100.0, method)
+            assert resampled.dtype == data.dtype
+            assert resampled.shape[1] == 2
+            assert abs(len(resampled) - expected) <= 1
+
+        # Same samplerate as the track, the data comes back as it is
+        ramp = np.linspace(-1.0, 1.0, 2048, dtype=np.float32).reshape(-1, 2)
+        resampled = t.resample(ramp, 48000.0, "polyphase")
+        assert resampled.dtype == ramp.dtype
+        assert resampled is not ramp
+        assert np.array_equal(resampled, ramp)
+
+        await t.stop()
+
     async def test_output_spam(self) -> None:
         t = OutputTrack("track")
 
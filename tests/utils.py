@@ -0,0 +1,115 @@
+import threading
+
+import numpy as np
+import scipy.signal
+from maglevapi.testing import Testing
+from pyaudio_mixer import utils
+from pyaudio_mixer.utils import (
+    RingBuffer,
+    channel_matrix,
+    flush_denormals,
+    polyphase_resample,
+)
+
+
+class TestUtils(Testing):
+    def __init__(self) -> None:
+        super().__init__(save_path="./tests/results/TestUtils.tresult")
+
+    async def test_ring_buffer(self) -> None:
+        ring = RingBuffer(1024, 2)
+        data = np.arange(1024 * 2, dtype=np.float32).reshape(-1, 2)
+
+        assert ring.write(data[:512])
+        assert ring.read_available == 512
+        assert ring.write_available == 512
+        assert not ring.write(data, wait=False)
+
+        out = np.zeros((1024, 2), dtype=np.float32)
+        assert ring.readinto(out) == 512
+        assert (out[:512] == data[:512]).all()
+        assert ring.write_available == 1024
+
+    async def test_ring_buffer_clear_unblocks_writer(self) -> None:
+        """A producer waiting on a full buffer has to finish once the buffer is cleared (i.e., abort() while play_file is writing)."""
+
+        ring = RingBuffer(1024, 2)
+        assert ring.write(np.ones((1024, 2), dtype=np.float32))
+        assert ring.write_available == 0
+
+        writer = threading.Thread(
+            target=ring.write, args=(np.full((512, 2), 2.0, dtype=np.float32),)
+        )
+        writer.start()
+        writer.join(0.2)
+        assert writer.is_alive()
+
+        ring.clear()
+        writer.join(1)
+        assert not writer.is_alive()
+
+        # Only what was written after the clear gets read
+        out = np.zeros((1024, 2), dtype=np.float32)
+        assert ring.readinto(out) == 512
+        assert (out[:512] == 2.0).all()
+
+    async def test_flush_denormals(self) -> None:
+        """Only the thread that called flush_denormals flushes denormals to zero."""
+
+        tiny = np.array([1e-38], dtype=np.float32)
+        results = []
+
+        def _flushed() -> None:
+            flush_denormals()
+            results.append(float((tiny * np.float32(1e-3))[0]))
+
+        thread = threading.Thread(target=_flushed)
+        thread.start()
+        thread.join()
+
+        if utils._libm is not None:
+            assert results == [0.0]
+        assert (tiny * np.float32(1e-3))[0] != 0.0
+
+    async def test_polyphase_resample(self) -> None:
+        """Matches scipy.signal.resample_poly to within float32 rounding."""
+
+        rng = np.random.default_rng(0)
+        for original, target in ((8000, 48000), (44100, 48000)):
+            g = np.gcd(original, target)
+            up, down = target // g, original // g
+
+            # The short one is shorter than the filter, that's where the output gets padded
+            for frames in (10, 20000):
+                data = rng.uniform(-1.0, 1.0, (frames, 2)).astype(np.float32)
+                expected = scipy.signal.resample_poly(data, up, down, axis=0)
+
+                resampled = polyphase_resample(data, up, down)
+                assert resampled.dtype == np.float32
+                assert resampled.shape == expected.shape
+                assert np.allclose(resampled, expected, atol=1e-5)
+
+    async def test_channel_matrix(self) -> None:
+        # 5.1 to stereo (ITU-R BS.775), the LFE is dropped
+        assert np.allclose(
+            channel_matrix(6, 2),
+            [
+                [1.0, 0.0],
+                [0.0, 1.0],
+                [0.707, 0.707],
+                [0.0, 0.0],
+                [0.707, 0.0],
+                [0.0, 0.707],
+            ],
+        )
+
+        # Mono averages every channel
+        surround = np.arange(6, dtype=np.float32).reshape(1, 6)
+        assert np.allclose(surround @ channel_matrix(6, 1), [[2.5]])
+
+        # Anything else wraps the channels around
+        assert np.array_equal(channel_matrix(2, 3), [[1.0, 0.0, 1.0], [0.0, 1.0, 0.0]])
+        assert np.array_equal(
+            channel_matrix(4, 3),
+            [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0], [1.0, 0.0, 0.0]],
+        )